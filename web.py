@@ -1,22 +1,25 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import pickle
+import mmap
 import xgboost
 import os
-import shap
-import streamlit.components.v1 as components
+import math
+from bisect import bisect_right
 
-# ==========================================
-# 1. Page Configuration
-# ==========================================
-st.set_page_config(
-    page_title="GD Adverse Perinatal Outcome Predictor",
-    layout="wide",
-    initial_sidebar_state="expanded"
+# Feature order expected by the trained booster
+FEATURE_NAMES = ('BMI', 'FPG', 'TG', 'A1.B', 'D-dimer')
+
+# Risk bands as (css class, title, guidance): low < 0.25 <= moderate <= 0.6 < high
+RISK_BANDS = (
+    ("status-low", "Low Risk Profile", "Standard management suggested."),
+    ("status-mod", "Moderate Risk Profile", "Increased surveillance suggested."),
+    ("status-high", "High Risk Profile", "Intensive monitoring recommended."),
 )
+# bisect_right cut-offs; nudging 0.6 up one ulp keeps exactly 0.6 in the moderate band
+RISK_CUTOFFS = (0.25, math.nextafter(0.6, 1.0))
 
-# Custom CSS
-st.markdown("""
+_CSS = """
     <style>
     html, body, [class*="css"] { font-family: 'Segoe UI', sans-serif; }
     .result-box { padding: 20px; border-radius: 4px; border: 1px solid #dee2e6; margin-bottom: 20px; background-color: #fcfcfc; }
@@ -26,12 +29,19 @@ st.markdown("""
     .status-low { border-left: 6px solid #198754; }
     .status-mod { border-left: 6px solid #ffc107; }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+# ==========================================
+# 1. Page Configuration
+# ==========================================
+st.set_page_config(
+    page_title="GD Adverse Perinatal Outcome Predictor",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
 
-def st_shap(plot, height=None):
-    # SHAP force plots require the Javascript library to be loaded
-    shap_html = f"<head>{shap.getjs()}</head><body>{plot.html()}</body>"
-    components.html(shap_html, height=height if height else 150)
+# Custom CSS
+st.markdown(_CSS, unsafe_allow_html=True)
 
 st.markdown("### Clinical Prediction System for Adverse Perinatal Outcome")
 st.markdown("GD Patient Risk Assessment | XGBoost-SHAP Integration")
@@ -46,10 +56,38 @@ def load_model():
     if not os.path.exists(model_filename):
         st.error(f"Error: '{model_filename}' not found.")
         st.stop()
-    with open(model_filename, 'rb') as file:
-        return pickle.load(file)
+    # Map the file instead of streaming it so pages are read on demand while unpickling
+    with open(model_filename, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        model = pickle.loads(mm)
+    # Warm up the prediction path once per process so the first click is not a cold start
+    dummy = np.zeros((1, len(FEATURE_NAMES)), dtype=np.float32)
+    booster = model.get_booster()
+    # The booster is shared by every session; one thread each avoids oversubscribing the CPU
+    booster.set_param({'nthread': 1})
+    booster.predict(xgboost.DMatrix(dummy, feature_names=list(FEATURE_NAMES), nthread=1), pred_contribs=True)
+    return model
 
 model = load_model()
+booster = model.get_booster()
+
+def score_batch(rows):
+    # Expect one row per patient; never regroup values into different patients
+    arr = np.ascontiguousarray(rows, dtype=np.float32)
+    if arr.ndim != 2 or arr.shape[1] != len(FEATURE_NAMES):
+        raise ValueError(f"Expected rows of shape (n, {len(FEATURE_NAMES)}), got {arr.shape}")
+    # Build a single row serially; larger batches use every core
+    dmat = xgboost.DMatrix(arr, feature_names=list(FEATURE_NAMES), nthread=1 if len(arr) == 1 else -1)
+    # XGBoost computes TreeSHAP natively; the last column is the expected value
+    contribs = booster.predict(dmat, pred_contribs=True)
+    # Contributions sum to the log-odds margin, so one tree walk also gives P(adverse outcome)
+    risk_probs = 1.0 / (1.0 + np.exp(-contribs.sum(axis=1)))
+    return risk_probs, contribs[:, :-1], contribs[:, -1]
+
+@st.cache_data(max_entries=256)
+def predict_and_explain(bmi, fpg, tg, a1_b, d_dimer):
+    risk_probs, shap_values, expected_values = score_batch([(bmi, fpg, tg, a1_b, d_dimer)])
+    return float(risk_probs[0]), shap_values[0], float(expected_values[0])
 
 # ==========================================
 # 3. Sidebar: Clinical Parameters
@@ -67,30 +105,21 @@ with st.sidebar:
 # ==========================================
 # 4. Main Interface
 # ==========================================
-if submitted:
-    # UPDATED: Keys now match ['BMI', 'FPG', 'TG', 'A1.B', 'D-dimer']
-    input_data = {
-        'BMI': bmi,
-        'FPG': fpg,
-        'TG': tg,
-        'A1.B': a1_b,
-        'D-dimer': d_dimer
-    }
-    df_input = pd.DataFrame([input_data])
+# The last result lives in session_state so unrelated reruns redraw it without recomputing
+if submitted or 'last_result' in st.session_state:
+    # Only the results view needs Plotly; keep it off the first-paint path
+    import plotly.graph_objects as go
 
     try:
-        prediction_probs = model.predict_proba(df_input)[0]
-        risk_prob = float(prediction_probs[1])
+        if submitted:
+            values = (bmi, fpg, tg, a1_b, d_dimer)
+            st.session_state['last_result'] = (values, *predict_and_explain(*values))
+        values, risk_prob, shap_values, expected_value = st.session_state['last_result']
         
         col1, col2 = st.columns([1, 1])
         
         with col1:
-            if risk_prob > 0.6:
-                status_class, status_text, advice = "status-high", "High Risk Profile", "Intensive monitoring recommended."
-            elif risk_prob < 0.25:
-                status_class, status_text, advice = "status-low", "Low Risk Profile", "Standard management suggested."
-            else:
-                status_class, status_text, advice = "status-mod", "Moderate Risk Profile", "Increased surveillance suggested."
+            status_class, status_text, advice = RISK_BANDS[bisect_right(RISK_CUTOFFS, risk_prob)]
 
             st.markdown(f"""
             <div class="result-box {status_class}">
@@ -109,16 +138,26 @@ if submitted:
             m2.metric("Relative Risk", "Elevated" if risk_prob > 0.4 else "Stable")
             
             with st.expander("Feature Input Log"):
-                st.table(df_input.T.rename(columns={0: 'Value'}))
+                st.table({'Feature': list(FEATURE_NAMES), 'Value': list(values)})
 
         st.markdown("#### Patient-Specific Contribution (SHAP Interpretation)")
-        explainer = shap.TreeExplainer(model)
-        shap_values = explainer.shap_values(df_input)
-        
-        # Link="logit" displays probabilities instead of log-odds
-        st_shap(shap.force_plot(explainer.expected_value, shap_values[0], df_input.iloc[0], link="logit"), height=140)
+        # Native Plotly chart instead of the SHAP JS force plot; red pushes risk up, green down
+        fig = go.Figure(go.Bar(
+            x=shap_values,
+            y=[f"{name} = {value:g}" for name, value in zip(FEATURE_NAMES, values)],
+            orientation='h',
+            marker_color=["#dc3545" if v > 0 else "#198754" for v in shap_values],
+        ))
+        fig.update_layout(
+            xaxis_title=f"SHAP value (log-odds, base value {expected_value:.2f})",
+            yaxis={'autorange': 'reversed'},
+            height=260,
+            margin={'l': 10, 'r': 10, 't': 10, 'b': 10},
+        )
+        st.plotly_chart(fig)
 
     except Exception as e:
+        st.session_state.pop('last_result', None)
         st.error(f"Calculation Error: {str(e)}")
 else:
     st.info("Enter clinical measurements in the sidebar and click 'Predict' to begin.")
\ No newline at end of file